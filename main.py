@@ -1,7 +1,12 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import streamlit as st
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
 
 
 # ---------------------------------------------------------
@@ -23,6 +28,11 @@ def init_session_state():
         "produtividade_kg_ha",
         "perda_campo_percent",
         "perda_benef_percent",
+        "custo_plantio",
+        "custo_conducao",
+        "custo_pos_colheita",
+        "custos_produtos",
+        "preco_minimo_risco",
     ]
     for k in default_keys:
         if k not in st.session_state:
@@ -102,6 +112,374 @@ def coletar_custos_etapa(etapa_id: str, titulo: str, itens: list) -> float:
     return total
 
 
+# Intervalos de confiança por médias de lotes (batch means): as amostras são
+# divididas em N_LOTES lotes, a estatística é calculada em cada lote e a
+# dispersão entre lotes dá a margem de erro, sem reamostrar o vetor inteiro.
+N_LOTES = 20
+
+# t de Student bicaudal, por graus de liberdade (N_LOTES - 1) e nível de confiança.
+# Ao mudar N_LOTES, acrescente aqui a linha com os graus de liberdade novos.
+T_CRITICO_STUDENT = {
+    19: {
+        90: 1.729,
+        95: 2.093,
+        99: 2.861,
+    },
+}
+T_CRITICO_LOTES = T_CRITICO_STUDENT[N_LOTES - 1]
+
+# Normal padrão bicaudal, para o intervalo de Wilson das proporções
+Z_CRITICO_NORMAL = {
+    90: 1.645,
+    95: 1.960,
+    99: 2.576,
+}
+
+QUANTIS_IC = (0.05, 0.25, 0.50, 0.75, 0.95)
+
+
+def dividir_em_lotes(valores: np.ndarray, n_lotes: int = N_LOTES) -> np.ndarray:
+    """
+    Reorganiza as amostras (ao longo do primeiro eixo) em `n_lotes` lotes de
+    mesmo tamanho. As sobras do final são descartadas.
+    """
+    valores = np.asarray(valores)
+    tamanho = len(valores) // n_lotes
+    return valores[: tamanho * n_lotes].reshape((n_lotes, tamanho) + valores.shape[1:])
+
+
+def meia_largura_ic(estatisticas_lotes: np.ndarray, nivel_confianca: int) -> np.ndarray:
+    """
+    Meia largura do intervalo de confiança a partir da estatística calculada
+    em cada lote (lotes no último eixo).
+    """
+    n_lotes = estatisticas_lotes.shape[-1]
+    erro_padrao = estatisticas_lotes.std(axis=-1, ddof=1) / np.sqrt(n_lotes)
+    return T_CRITICO_STUDENT[n_lotes - 1][nivel_confianca] * erro_padrao
+
+
+def intervalo_media(valores: np.ndarray, nivel_confianca: int) -> tuple:
+    """Média de todas as amostras e meia largura do IC por médias de lotes."""
+    lotes = dividir_em_lotes(valores)
+    return float(np.mean(valores)), float(meia_largura_ic(lotes.mean(axis=1), nivel_confianca))
+
+
+def intervalo_proporcao(eventos: np.ndarray, nivel_confianca: int) -> tuple:
+    """
+    Proporção de eventos e limites do intervalo de Wilson (binomial). Ao
+    contrário das médias de lotes, continua com largura positiva quando
+    nenhum ou todos os cenários têm o evento.
+    """
+    n = len(eventos)
+    p = np.count_nonzero(eventos) / n
+    z2 = Z_CRITICO_NORMAL[nivel_confianca] ** 2
+    centro = (p + z2 / (2 * n)) / (1 + z2 / n)
+    meia = np.sqrt(z2 * p * (1 - p) / n + z2 ** 2 / (4 * n ** 2)) / (1 + z2 / n)
+    return p, max(centro - meia, 0.0), min(centro + meia, 1.0)
+
+
+def tabela_intervalos(df: pd.DataFrame, nivel_confianca: int) -> pd.DataFrame:
+    """
+    Monta a tabela de média e quantis de cada coluna com o respectivo
+    intervalo de confiança. Todas as colunas são tratadas de uma vez.
+    """
+    valores = df.to_numpy()
+    lotes = dividir_em_lotes(valores)
+
+    nomes = ["média"] + [f"{q:.0%}" for q in QUANTIS_IC]
+    # Estimativas pontuais com todas as amostras: (estatísticas, colunas)
+    estimativas = np.vstack([valores.mean(axis=0), np.quantile(valores, QUANTIS_IC, axis=0)])
+    # Estatísticas por lote: (estatísticas, colunas, lotes)
+    por_lote = np.concatenate([
+        lotes.mean(axis=1).T[np.newaxis],
+        np.quantile(lotes, QUANTIS_IC, axis=1).transpose(0, 2, 1),
+    ])
+    meias = meia_largura_ic(por_lote, nivel_confianca)
+
+    linhas = []
+    for j, coluna in enumerate(df.columns):
+        for i, nome in enumerate(nomes):
+            linhas.append({
+                "Variável": coluna,
+                "Estatística": nome,
+                "Estimativa": estimativas[i, j],
+                "IC inferior": estimativas[i, j] - meias[i, j],
+                "IC superior": estimativas[i, j] + meias[i, j],
+            })
+    return pd.DataFrame(linhas).set_index(["Variável", "Estatística"])
+
+
+# Recursos de simulação compartilhados entre todas as sessões do servidor.
+# Os limites podem ser ajustados por variáveis de ambiente na hora de subir o app.
+# O orçamento em MB cobre os buffers pré-alocados e os temporários das simulações.
+MAX_SIMULACOES_SIMULTANEAS = int(os.environ.get("MACAXEIRA_MAX_SIMULACOES", 4))
+ORCAMENTO_MEMORIA_MB = float(os.environ.get("MACAXEIRA_ORCAMENTO_MB", 24))
+ESPERA_MAXIMA_S = float(os.environ.get("MACAXEIRA_ESPERA_MAXIMA_S", 20))
+
+MAX_AMOSTRAS = 50000
+MIN_AMOSTRAS = 1000
+
+# Séries guardadas por amostra na simulação (uma por coluna de COLUNAS_SIMULACAO)
+N_SERIES = 8
+# Bytes por amostra no buffer pré-alocado de cada vaga
+BYTES_BUFFER_POR_AMOSTRA = N_SERIES * 8
+# Bytes por amostra alocados a mais durante uma simulação: o vetor sorteado
+# por np.random.triangular antes de ir para o buffer (1 float), o recorte das
+# 4 colunas do resumo (4 floats), a cópia que np.quantile ordena (4 floats)
+# e a máscara de prejuízo (1 byte)
+BYTES_TEMPORARIOS_POR_AMOSTRA = (1 + 4 + 4) * 8 + 1
+
+COLUNAS_SIMULACAO = [
+    "Produtividade_kg_ha",
+    "Preço_R$/kg",
+    "Custo_var_R$/kg",
+    "Produção_total_kg",
+    "Receita_total_R$",
+    "Custo_var_total_R$",
+    "Margem_total_R$",
+    "Margem_unit_R$/kg",
+]
+
+
+class RecursosSimulacao:
+    """
+    Controla quantas simulações rodam ao mesmo tempo no servidor e quantas
+    amostras elas ocupam na memória. Cada vaga tem um buffer pré-alocado
+    que é reaproveitado de uma simulação para a outra.
+    """
+
+    def __init__(self, max_simultaneas: int, orcamento_mb: float, max_amostras: int):
+        orcamento_bytes = orcamento_mb * 1024 ** 2
+        bytes_buffer = max_amostras * BYTES_BUFFER_POR_AMOSTRA
+        # Os buffers saem do orçamento primeiro; se não couberem todos com
+        # folga para uma simulação mínima cada, o número de vagas é reduzido
+        # (sempre fica pelo menos uma)
+        n_vagas = int(orcamento_bytes // (bytes_buffer + MIN_AMOSTRAS * BYTES_TEMPORARIOS_POR_AMOSTRA))
+        n_vagas = max(1, min(max_simultaneas, n_vagas))
+
+        self.max_amostras = max_amostras
+        # O que sobra limita quantas amostras podem estar em uso ao mesmo tempo
+        self.orcamento_amostras = max(
+            int((orcamento_bytes - n_vagas * bytes_buffer) // BYTES_TEMPORARIOS_POR_AMOSTRA),
+            MIN_AMOSTRAS,
+        )
+        self._cond = threading.Condition()
+        self._amostras_em_uso = 0
+        self._buffers_livres = [
+            np.empty((N_SERIES, max_amostras))
+            for _ in range(n_vagas)
+        ]
+
+    @contextmanager
+    def reservar(self, n_pedido: int, espera_maxima: float):
+        """
+        Reserva uma vaga e memória para `n_pedido` amostras. Se há vaga mas
+        falta memória, roda na hora com o que estiver livre (no mínimo
+        MIN_AMOSTRAS). Só espera, até `espera_maxima` segundos, quando não
+        há vaga ou nem MIN_AMOSTRAS cabem. Devolve `(buffer, n)` ou `None`
+        quando o servidor continua cheio.
+        """
+        n_pedido = min(int(n_pedido), self.max_amostras)
+        prazo = time.monotonic() + espera_maxima
+        with self._cond:
+            while True:
+                livre = self.orcamento_amostras - self._amostras_em_uso
+                n = min(n_pedido, livre)
+                if self._buffers_livres and n >= min(n_pedido, MIN_AMOSTRAS):
+                    break
+                restante = prazo - time.monotonic()
+                if restante <= 0:
+                    n = 0
+                    break
+                self._cond.wait(restante)
+
+            if n == 0:
+                buffer = None
+            else:
+                buffer = self._buffers_livres.pop()
+                self._amostras_em_uso += n
+
+        if buffer is None:
+            yield None
+            return
+
+        try:
+            yield buffer, n
+        finally:
+            with self._cond:
+                self._buffers_livres.append(buffer)
+                self._amostras_em_uso -= n
+                self._cond.notify_all()
+
+
+@st.cache_resource
+def obter_recursos_simulacao() -> RecursosSimulacao:
+    """Instância única, compartilhada por todas as sessões do servidor."""
+    return RecursosSimulacao(MAX_SIMULACOES_SIMULTANEAS, ORCAMENTO_MEMORIA_MB, MAX_AMOSTRAS)
+
+
+# Custeio multiproduto: os custos de cada item (plantio, condução, colheita e
+# o processamento próprio de cada produto) são distribuídos entre os produtos
+# por uma matriz de alocação (itens x produtos, cada linha somando 1).
+PRODUTOS = [
+    "In natura",
+    "Descascada a vácuo",
+    "Congelada",
+]
+
+ITENS_COMPARTILHADOS = [
+    "Plantio",
+    "Condução da cultura",
+    "Colheita e pós-colheita",
+]
+
+ITENS_PRODUTO = [f"Processamento e embalagem – {p}" for p in PRODUTOS]
+
+OPCAO_CUSTEIO_SIMPLES = "Macaxeira vendável (custeio simples)"
+
+
+def matriz_alocacao_padrao(destino: np.ndarray) -> np.ndarray:
+    """
+    Itens compartilhados são divididos pela parte da raiz destinada a cada
+    produto; cada item de processamento vai inteiro para o seu produto.
+    """
+    compartilhados = np.tile(destino, (len(ITENS_COMPARTILHADOS), 1))
+    return np.vstack([compartilhados, np.eye(len(PRODUTOS))])
+
+
+def custear_multiproduto(
+    custos_itens: np.ndarray,
+    alocacao: np.ndarray,
+    raiz_kg: np.ndarray,
+    perda_campo: np.ndarray,
+    destino: np.ndarray,
+    perdas_processo: np.ndarray,
+) -> tuple:
+    """
+    Calcula, para vários produtores de uma vez, o custo, o volume vendável e
+    o custo variável unitário de cada produto.
+
+    - custos_itens: (produtores, itens), em R$
+    - alocacao: (itens, produtos), cada linha somando 1
+    - raiz_kg, perda_campo: (produtores,), perda em fração
+    - destino, perdas_processo: (produtos,), em fração
+
+    Devolve três matrizes (produtores, produtos): custo total, kg vendáveis e
+    custo variável unitário (NaN onde o volume é zero).
+    """
+    custo_produtos = custos_itens @ alocacao
+    raiz_pos_campo = raiz_kg * (1 - perda_campo)
+    volume_produtos = np.outer(raiz_pos_campo, destino * (1 - perdas_processo))
+    cvu_produtos = np.divide(
+        custo_produtos,
+        volume_produtos,
+        out=np.full_like(custo_produtos, np.nan),
+        where=volume_produtos > 0,
+    )
+    return custo_produtos, volume_produtos, cvu_produtos
+
+
+def escolher_produto(key: str):
+    """
+    Quando há custeio multiproduto na sessão, deixa o usuário escolher qual
+    produto usar. Devolve o nome do produto ou None (custeio simples).
+    """
+    custos_produtos = st.session_state["custos_produtos"]
+    if not custos_produtos:
+        return None
+    opcao = st.selectbox(
+        "Produto considerado",
+        [OPCAO_CUSTEIO_SIMPLES] + list(custos_produtos),
+        key=key,
+        help="Escolha um dos produtos calculados na aba de Custeio multiproduto, "
+             "ou fique com o custeio simples da primeira aba."
+    )
+    return None if opcao == OPCAO_CUSTEIO_SIMPLES else opcao
+
+
+# Ponto de equilíbrio: um conjunto fixo de cenários (choques relativos de
+# preço, produtividade e custo variável em torno de 1) é sorteado uma vez e
+# reaproveitado para avaliar P(prejuízo) em todos os pontos da grade.
+@st.cache_data
+def gerar_cenarios_equilibrio(
+    n_cenarios: int,
+    var_preco: float,
+    var_prod: float,
+    var_cvu: float,
+    semente: int = 0,
+) -> dict:
+    """Choques triangulares (1 - var, 1, 1 + var) para cada variável."""
+    rng = np.random.default_rng(semente)
+    return {
+        "preco": rng.triangular(1 - var_preco, 1.0, 1 + var_preco, n_cenarios),
+        "prod": rng.triangular(1 - var_prod, 1.0, 1 + var_prod, n_cenarios),
+        "cvu": rng.triangular(1 - var_cvu, 1.0, 1 + var_cvu, n_cenarios),
+    }
+
+
+def precos_equilibrio_cenarios(
+    cenarios: dict,
+    producao_kg: np.ndarray,
+    cvu: np.ndarray,
+    custos_fixos: float,
+    taxa_faturamento: float,
+) -> np.ndarray:
+    """
+    Preço a partir do qual cada cenário deixa de dar prejuízo, para cada
+    linha da grade. `producao_kg` e `cvu` têm uma linha por ponto (ou são
+    escalares); o resultado tem forma (linhas, cenários).
+
+    Prejuízo: (P * choque_preco * (1 - t) - CVU * choque_cvu) * Q * choque_prod < CF
+    """
+    producao = np.atleast_1d(producao_kg)[:, np.newaxis] * cenarios["prod"]
+    cvu_cenarios = np.atleast_1d(cvu)[:, np.newaxis] * cenarios["cvu"]
+    return (cvu_cenarios + custos_fixos / producao) / (cenarios["preco"] * (1 - taxa_faturamento))
+
+
+# Premissas do preço mínimo com risco controlado, conferidas na Precificação:
+# (chave, rótulo, formato). Valores numéricos iguais dentro de 1%.
+PREMISSAS_PRECO_RISCO = [
+    ("custos_fixos", "Custos fixos (R$)", ",.2f"),
+    ("taxa_percent", "Impostos + despesas variáveis (%)", ",.2f"),
+    ("cvu", "Custo variável unitário (R$/kg)", ",.4f"),
+    ("producao_kg", "Volume de venda (kg)", ",.2f"),
+]
+TOLERANCIA_PREMISSAS = 0.01
+
+
+def premissas_divergentes(guardadas: dict, atuais: dict) -> list:
+    """
+    Compara as premissas guardadas pela aba de Ponto de equilíbrio com as
+    atuais. Devolve (rótulo, valor guardado, valor atual) das que diferem.
+    """
+    divergencias = []
+    if guardadas["produto"] != atuais["produto"]:
+        divergencias.append((
+            "Produto",
+            guardadas["produto"] or OPCAO_CUSTEIO_SIMPLES,
+            atuais["produto"] or OPCAO_CUSTEIO_SIMPLES,
+        ))
+    for chave, rotulo, formato in PREMISSAS_PRECO_RISCO:
+        if not np.isclose(guardadas[chave], atuais[chave], rtol=TOLERANCIA_PREMISSAS, atol=1e-6):
+            divergencias.append((rotulo, format(guardadas[chave], formato), format(atuais[chave], formato)))
+    return divergencias
+
+
+def prob_prejuizo_grade(precos: np.ndarray, limiares: np.ndarray) -> np.ndarray:
+    """
+    P(prejuízo) em cada ponto (linha, preço): fração dos cenários cujo preço
+    de equilíbrio fica acima do preço da grade. Cada linha de limiares é
+    ordenada uma vez e os preços são localizados por busca binária.
+    """
+    ordenados = np.sort(limiares, axis=1)
+    n_cenarios = ordenados.shape[1]
+    acima = np.vstack([
+        n_cenarios - np.searchsorted(linha, precos, side="right")
+        for linha in ordenados
+    ])
+    return acima / n_cenarios
+
+
 # ---------------------------------------------------------
 # Página 1 – Custeio variável
 # ---------------------------------------------------------
@@ -306,6 +684,9 @@ def pagina_custeio_variavel():
         st.session_state["produtividade_kg_ha"] = produtividade_kg_ha
         st.session_state["perda_campo_percent"] = perda_campo_percent
         st.session_state["perda_benef_percent"] = perda_benef_percent
+        st.session_state["custo_plantio"] = custo_plantio
+        st.session_state["custo_conducao"] = custo_conducao
+        st.session_state["custo_pos_colheita"] = custo_pos
     else:
         st.error("A produção final vendável ficou igual a zero. Ajuste os dados de produção e perdas.")
 
@@ -331,12 +712,26 @@ def pagina_monte_carlo():
         "Com isso o app cria muitos cenários aleatórios entre esses valores."
     )
 
+    area_base = st.session_state["area_ha"] or 1.0
+    prod_base = st.session_state["produtividade_kg_ha"] or 20000.0
+    cvu_base = st.session_state["custo_variavel_unitario"] or 1.50
+    produto = escolher_produto("produto_monte_carlo")
+    if produto is not None:
+        dados_produto = st.session_state["custos_produtos"][produto]
+        area_base = dados_produto["area_ha"]
+        prod_base = dados_produto["produtividade_kg_ha"]
+        cvu_base = dados_produto["custo_variavel_unitario"]
+        st.caption(
+            f"Valores iniciais preenchidos com o produto **{produto}**: a produtividade é a de kg "
+            "vendáveis desse produto por hectare, já descontadas as perdas."
+        )
+
     col1, col2 = st.columns(2)
     with col1:
         n_sim = st.number_input(
             "Número de simulações (quantidade de cenários gerados)",
-            min_value=1000,
-            max_value=50000,
+            min_value=MIN_AMOSTRAS,
+            max_value=MAX_AMOSTRAS,
             step=1000,
             value=10000,
             help="Quanto maior o número, mais Cenários o sistema cria. 10.000 já costuma ser um bom valor."
@@ -346,10 +741,17 @@ def pagina_monte_carlo():
             "Área considerada na simulação (ha)",
             min_value=0.0,
             step=0.1,
-            value=st.session_state["area_ha"] or 1.0,
+            value=float(area_base),
             help="Quantos hectares de macaxeira você quer considerar nesses cenários."
         )
 
+    nivel_confianca = st.selectbox(
+        "Nível de confiança dos intervalos (%)",
+        options=list(T_CRITICO_LOTES),
+        index=1,
+        help="Cada resultado vem com uma margem de erro. Quanto maior o nível, mais largo o intervalo."
+    )
+
     st.markdown("#### Produtividade (kg/ha) – distribuição triangular")
     col_p1, col_p2, col_p3 = st.columns(3)
     with col_p1:
@@ -357,7 +759,7 @@ def pagina_monte_carlo():
             "Produtividade mínima (kg/ha)",
             min_value=0.0,
             step=100.0,
-            value=15000.0,
+            value=15000.0 if produto is None else prod_base * 0.75,
             help="Cenário ruim: quantos kg/ha se a safra for fraca."
         )
     with col_p2:
@@ -365,7 +767,7 @@ def pagina_monte_carlo():
             "Produtividade mais provável (kg/ha)",
             min_value=0.0,
             step=100.0,
-            value=st.session_state["produtividade_kg_ha"] or 20000.0,
+            value=float(prod_base),
             help="Valor que você acha mais realista para a produtividade."
         )
     with col_p3:
@@ -373,7 +775,7 @@ def pagina_monte_carlo():
             "Produtividade máxima (kg/ha)",
             min_value=0.0,
             step=100.0,
-            value=25000.0,
+            value=25000.0 if produto is None else prod_base * 1.25,
             help="Cenário muito bom: quantos kg/ha se tudo der certo."
         )
 
@@ -405,7 +807,6 @@ def pagina_monte_carlo():
         )
 
     st.markdown("#### Custo variável unitário (R$/kg) – distribuição triangular")
-    cvu_base = st.session_state["custo_variavel_unitario"] or 1.50
 
     col_c1, col_c2, col_c3 = st.columns(3)
     with col_c1:
@@ -445,31 +846,58 @@ def pagina_monte_carlo():
             st.error("Custo variável: garanta que mínimo ≤ mais provável ≤ máximo.")
             return
 
-        # Geração das amostras
-        prod_samples = np.random.triangular(prod_min, prod_most, prod_max, int(n_sim))
-        preco_samples = np.random.triangular(preco_min, preco_most, preco_max, int(n_sim))
-        cvu_samples = np.random.triangular(cvu_min, cvu_most, cvu_max, int(n_sim))
-
-        producao_total = prod_samples * area_ha_sim
-        receita_total = preco_samples * producao_total
-        custo_variavel_total = cvu_samples * producao_total
-        margem_total = receita_total - custo_variavel_total
-        margem_unitaria = preco_samples - cvu_samples
-
-        df = pd.DataFrame({
-            "Produtividade_kg_ha": prod_samples,
-            "Preço_R$/kg": preco_samples,
-            "Custo_var_R$/kg": cvu_samples,
-            "Produção_total_kg": producao_total,
-            "Receita_total_R$": receita_total,
-            "Custo_var_total_R$": custo_variavel_total,
-            "Margem_total_R$": margem_total,
-            "Margem_unit_R$/kg": margem_unitaria,
-        })
-
-        margem_total_media = df["Margem_total_R$"].mean()
-        prob_prejuizo = (df["Margem_total_R$"] < 0).mean() * 100
-        margem_unit_media = df["Margem_unit_R$/kg"].mean()
+        recursos = obter_recursos_simulacao()
+        with st.spinner("Rodando simulação (se o servidor estiver cheio, ela aguarda na fila)..."), \
+                recursos.reservar(int(n_sim), ESPERA_MAXIMA_S) as reserva:
+            if reserva is None:
+                st.error(
+                    "O servidor está com muitas simulações ao mesmo tempo. "
+                    "Aguarde alguns instantes e clique em **Rodar simulação** novamente."
+                )
+                return
+
+            buffer, n_amostras = reserva
+
+            # Geração das amostras direto no buffer reaproveitado (uma linha por série)
+            amostras = buffer[:, :n_amostras]
+            prod_samples, preco_samples, cvu_samples, producao_total, receita_total, \
+                custo_variavel_total, margem_total, margem_unitaria = amostras
+
+            prod_samples[:] = np.random.triangular(prod_min, prod_most, prod_max, n_amostras)
+            preco_samples[:] = np.random.triangular(preco_min, preco_most, preco_max, n_amostras)
+            cvu_samples[:] = np.random.triangular(cvu_min, cvu_most, cvu_max, n_amostras)
+
+            np.multiply(prod_samples, area_ha_sim, out=producao_total)
+            np.multiply(preco_samples, producao_total, out=receita_total)
+            np.multiply(cvu_samples, producao_total, out=custo_variavel_total)
+            np.subtract(receita_total, custo_variavel_total, out=margem_total)
+            np.subtract(preco_samples, cvu_samples, out=margem_unitaria)
+
+            # O DataFrame é só uma visão do buffer: nada é copiado
+            df = pd.DataFrame(amostras.T, columns=COLUNAS_SIMULACAO, copy=False)
+            colunas_resumo = ["Receita_total_R$", "Custo_var_total_R$", "Margem_total_R$", "Margem_unit_R$/kg"]
+
+            # Tudo o que depende das amostras é resumido aqui dentro; a vaga e o
+            # buffer são liberados antes de desenhar tabelas e gráfico
+            margem_total_media, ic_margem_total = intervalo_media(margem_total, nivel_confianca)
+            prob_prejuizo, prejuizo_inf, prejuizo_sup = 100 * np.array(
+                intervalo_proporcao(margem_total < 0, nivel_confianca)
+            )
+            margem_unit_media, ic_margem_unit = intervalo_media(margem_unitaria, nivel_confianca)
+
+            df_resumo = df[colunas_resumo]
+            resumo = df_resumo.describe().T
+            resumo_ic = tabela_intervalos(df_resumo, nivel_confianca)
+            contagens, bordas = np.histogram(margem_total, bins=30)
+            del df, df_resumo, amostras, prod_samples, preco_samples, cvu_samples, producao_total, \
+                receita_total, custo_variavel_total, margem_total, margem_unitaria
+
+        if n_amostras < int(n_sim):
+            st.warning(
+                f"O servidor está com muitas simulações ao mesmo tempo. Para não travar o app, "
+                f"esta simulação usou **{n_amostras:,} cenários** em vez de {int(n_sim):,}. "
+                "As margens de erro abaixo já consideram esse número menor."
+            )
 
         st.markdown("### Resultados resumidos da simulação")
         col_r1, col_r2, col_r3 = st.columns(3)
@@ -478,33 +906,58 @@ def pagina_monte_carlo():
                 "Margem total média (R$)",
                 f"{margem_total_media:,.2f}"
             )
+            st.caption(f"IC {nivel_confianca}%: ± R$ {ic_margem_total:,.2f}")
         with col_r2:
             st.metric(
                 "Probabilidade de margem total negativa",
                 f"{prob_prejuizo:,.1f} %"
             )
+            st.caption(f"IC {nivel_confianca}%: de {prejuizo_inf:,.1f} % a {prejuizo_sup:,.1f} %")
         with col_r3:
             st.metric(
                 "Margem unitária média (R$/kg)",
                 f"{margem_unit_media:,.4f}"
             )
+            st.caption(f"IC {nivel_confianca}%: ± R$ {ic_margem_unit:,.4f}")
 
         st.caption(
             f"Em linguagem simples: em média, a atividade deixaria cerca de **R$ {margem_total_media:,.2f}** "
             f"para pagar custos fixos e lucro. Em aproximadamente **{prob_prejuizo:,.1f}%** dos cenários, "
             "a margem fica negativa (ou seja, **não sobra nada para fixos e lucro**)."
         )
+        if 4 * n_amostras <= MAX_AMOSTRAS:
+            dica_precisao = (
+                f"para reduzir a margem de erro pela metade, seriam necessárias cerca de "
+                f"**{4 * n_amostras:,} simulações**."
+            )
+        elif n_amostras < MAX_AMOSTRAS:
+            dica_precisao = (
+                f"com o máximo permitido, **{MAX_AMOSTRAS:,} simulações**, a margem de erro cairia para "
+                f"cerca de **{np.sqrt(n_amostras / MAX_AMOSTRAS):.0%}** da atual."
+            )
+        else:
+            dica_precisao = "esta simulação já usou o número máximo de cenários permitido."
+        st.caption(
+            f"As margens de erro mostram o quanto esses números ainda podem mudar por causa do sorteio "
+            f"dos cenários. Elas caem com a raiz do número de simulações: {dica_precisao}"
+        )
 
         st.markdown("#### Estatísticas principais (valores simulados)")
-        st.dataframe(
-            df[["Receita_total_R$", "Custo_var_total_R$", "Margem_total_R$", "Margem_unit_R$/kg"]]
-            .describe()
-            .T
+        st.dataframe(resumo)
+
+        st.markdown(f"#### Média e quantis com intervalo de confiança de {nivel_confianca}%")
+        st.dataframe(resumo_ic)
+        st.caption(
+            f"Intervalos calculados por médias de lotes: os cenários são divididos em {N_LOTES} grupos "
+            "e a variação do resultado entre os grupos indica a precisão de cada número."
         )
 
         st.markdown("#### Distribuição da margem total (R$)")
-        fig, ax = plt.subplots()
-        ax.hist(df["Margem_total_R$"], bins=30)
+        # Figure avulsa (sem pyplot): não fica registrada no estado global
+        # do matplotlib e é liberada junto com a sessão
+        fig = Figure()
+        ax = fig.subplots()
+        ax.hist(bordas[:-1], bins=bordas, weights=contagens)
         ax.set_xlabel("Margem total (R$)")
         ax.set_ylabel("Quantidade de cenários")
         st.pyplot(fig)
@@ -539,15 +992,25 @@ def pagina_precificacao():
         "Se preferir, pode informar um valor manualmente."
     )
 
+    cvu_calculado = st.session_state["custo_variavel_unitario"]
+    volume_padrao = st.session_state["producao_final_kg"] or 0.0
+    produto = escolher_produto("produto_precificacao")
+    if produto is not None:
+        dados_produto = st.session_state["custos_produtos"][produto]
+        cvu_calculado = dados_produto["custo_variavel_unitario"]
+        volume_padrao = dados_produto["producao_final_kg"]
+
     usa_cvu_calculado = False
-    if st.session_state["custo_variavel_unitario"] is not None:
+    if cvu_calculado is not None:
         usa_cvu_calculado = st.checkbox(
-            "Usar o custo variável unitário calculado na aba de Custeio variável",
+            "Usar o custo variável unitário calculado na aba de Custeio variável"
+            if produto is None else
+            f"Usar o custo variável unitário calculado para o produto {produto}",
             value=True
         )
 
     if usa_cvu_calculado:
-        cvu = st.session_state["custo_variavel_unitario"]
+        cvu = cvu_calculado
         st.info(f"Custo variável unitário considerado: **R$ {cvu:,.4f} por kg**.")
     else:
         cvu = st.number_input(
@@ -585,7 +1048,6 @@ def pagina_precificacao():
             help="Quanto você gostaria de ganhar de lucro com essa produção."
         )
 
-    volume_padrao = st.session_state["producao_final_kg"] or 0.0
     volume_previsto_kg = st.number_input(
         "Volume previsto de venda desta produção (kg)",
         min_value=0.0,
@@ -713,6 +1175,598 @@ def pagina_precificacao():
                 "de impostos e despesas variáveis."
             )
 
+        preco_risco = st.session_state["preco_minimo_risco"]
+        if preco_risco is not None:
+            divergencias = premissas_divergentes(preco_risco, {
+                "produto": produto,
+                "custos_fixos": custos_fixos_totais,
+                "taxa_percent": soma_tx * 100,
+                "cvu": cvu,
+                "producao_kg": volume_previsto_kg,
+            })
+            if divergencias:
+                st.info(
+                    f"A aba de Ponto de equilíbrio indicou **R$ {preco_risco['preco']:,.4f}** como preço mínimo "
+                    f"para até {preco_risco['tolerancia']:,.0f}% de chance de prejuízo, mas **em um cenário "
+                    "diferente deste**. Valores usados lá × aqui:\n"
+                    + "\n".join(f"- {rotulo}: {la} × {aqui}" for rotulo, la, aqui in divergencias)
+                    + "\n\nPara comparar os dois preços, use os mesmos valores nas duas abas."
+                )
+            elif preco_sugerido >= preco_risco["preco"]:
+                st.info(
+                    f"Pela aba de Ponto de equilíbrio, preços a partir de **R$ {preco_risco['preco']:,.4f}** "
+                    f"mantêm a chance de prejuízo em até {preco_risco['tolerancia']:,.0f}%. "
+                    "O preço sugerido está dentro desse limite."
+                )
+            else:
+                st.warning(
+                    f"Pela aba de Ponto de equilíbrio, abaixo de **R$ {preco_risco['preco']:,.4f}** a chance "
+                    f"de prejuízo passa de {preco_risco['tolerancia']:,.0f}%. O preço sugerido está abaixo "
+                    "desse valor: considere subir o preço ou rever as metas."
+                )
+
+# ---------------------------------------------------------
+# Página 4 – Custeio multiproduto
+# ---------------------------------------------------------
+# Colunas esperadas no arquivo CSV com vários produtores (custos em R$)
+COLUNAS_CSV_PRODUCAO = ["produtor", "area_ha", "produtividade_kg_ha", "perda_campo_percent"]
+COLUNAS_CSV_ITENS = [
+    "plantio",
+    "conducao",
+    "colheita_pos",
+    "processamento_in_natura",
+    "processamento_vacuo",
+    "processamento_congelada",
+]
+
+
+def linhas_com_problema(mascara: np.ndarray, colunas: list) -> list:
+    """
+    Para cada coluna com alguma célula marcada em `mascara`, monta o texto
+    com o nome da coluna e as linhas do arquivo (a linha 1 é o cabeçalho).
+    """
+    return [
+        f"{coluna} (linhas {', '.join(str(i + 2) for i in np.flatnonzero(mascara[:, j]))})"
+        for j, coluna in enumerate(colunas)
+        if mascara[:, j].any()
+    ]
+
+
+def pagina_custeio_multiproduto():
+    st.header("4. Custeio multiproduto – in natura, descascada a vácuo e congelada")
+
+    with st.expander("O que esta aba faz? (clique para ver)", expanded=True):
+        st.write(
+            "Quando a mesma lavoura vira **produtos diferentes**, os gastos de plantio, condução e colheita "
+            "são **divididos** entre eles, e cada produto ainda tem o seu próprio gasto de processamento "
+            "e embalagem.\n\n"
+            "Aqui você diz **quanto da raiz vai para cada produto**, quanto cada um perde no processamento "
+            "e **como dividir cada gasto** (matriz de alocação). O sistema mostra o **custo variável por kg "
+            "de cada produto**, que pode ser usado depois na simulação e na precificação."
+        )
+
+    st.subheader("Dados de produção do ciclo")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        area_ha = st.number_input(
+            "Área plantada (ha)",
+            min_value=0.0,
+            step=0.1,
+            value=st.session_state["area_ha"] or 1.0,
+            key="mp_area_ha",
+            help="Informe quantos hectares de macaxeira foram plantados."
+        )
+    with col2:
+        produtividade_kg_ha = st.number_input(
+            "Produtividade esperada de raiz colhida (kg/ha)",
+            min_value=0.0,
+            step=100.0,
+            value=st.session_state["produtividade_kg_ha"] or 20000.0,
+            key="mp_produtividade_kg_ha",
+            help="Quantos kg de raiz você espera colher, em média, por hectare."
+        )
+    with col3:
+        perda_campo_percent = st.number_input(
+            "Perdas na lavoura / colheita (%)",
+            min_value=0.0,
+            max_value=100.0,
+            step=1.0,
+            value=st.session_state["perda_campo_percent"] or 5.0,
+            key="mp_perda_campo",
+            help="Percentual que se perde no campo, antes de separar a raiz entre os produtos."
+        )
+
+    st.markdown("---")
+
+    st.subheader("Destino da raiz, perdas e processamento de cada produto")
+    st.caption(
+        "Informe **quanto da raiz** (em %) vai para cada produto, **quanto se perde** no processamento "
+        "próprio dele e **quanto se gasta** só com ele (descasque, vácuo, congelamento, embalagens etc.)."
+    )
+
+    destino_padrao = (60.0, 25.0, 15.0)
+    perda_processo_padrao = (10.0, 25.0, 30.0)
+    destino_percent = []
+    perdas_processo_percent = []
+    custos_processamento = []
+    colunas = st.columns(len(PRODUTOS))
+    for i, (produto, coluna) in enumerate(zip(PRODUTOS, colunas)):
+        with coluna:
+            st.markdown(f"**{produto}**")
+            destino_percent.append(st.number_input(
+                "Parte da raiz destinada (%)",
+                min_value=0.0,
+                max_value=100.0,
+                step=1.0,
+                value=destino_padrao[i],
+                key=f"mp_destino_{slugify(produto)}",
+            ))
+            perdas_processo_percent.append(st.number_input(
+                "Perdas no processamento (%)",
+                min_value=0.0,
+                max_value=100.0,
+                step=1.0,
+                value=perda_processo_padrao[i],
+                key=f"mp_perda_{slugify(produto)}",
+            ))
+            custos_processamento.append(st.number_input(
+                "Processamento e embalagem (total, em R$)",
+                min_value=0.0,
+                step=10.0,
+                key=f"mp_processamento_{slugify(produto)}",
+            ))
+
+    if abs(sum(destino_percent) - 100.0) > 0.01:
+        st.error("A soma das partes da raiz destinadas aos produtos deve ser 100%.")
+        # Sem custeio válido, as outras abas não podem seguir usando o anterior
+        st.session_state["custos_produtos"] = None
+        return
+
+    destino = np.array(destino_percent) / 100.0
+    perdas_processo = np.array(perdas_processo_percent) / 100.0
+
+    st.markdown("---")
+
+    st.subheader("Custos compartilhados entre os produtos")
+    st.caption(
+        "Se você preencheu a aba de Custeio variável, os totais de cada etapa já vêm preenchidos. "
+        "Nesta aba, a etapa de colheita e pós-colheita deve trazer só o que é **comum a todos os produtos**."
+    )
+    chaves_etapas = ["custo_plantio", "custo_conducao", "custo_pos_colheita"]
+    custos_compartilhados = []
+    colunas = st.columns(len(ITENS_COMPARTILHADOS))
+    for item, chave, coluna in zip(ITENS_COMPARTILHADOS, chaves_etapas, colunas):
+        with coluna:
+            custos_compartilhados.append(st.number_input(
+                f"{item} (total, em R$)",
+                min_value=0.0,
+                step=10.0,
+                value=float(st.session_state[chave] or 0.0),
+                key=f"mp_{chave}",
+            ))
+
+    st.markdown("---")
+
+    st.subheader("Matriz de alocação dos custos (%)")
+    st.caption(
+        "Cada linha diz **como dividir um gasto** entre os produtos. Por padrão, os gastos compartilhados "
+        "seguem a parte da raiz de cada produto e o processamento vai inteiro para o seu produto. "
+        "Se a linha não somar 100%, o sistema ajusta proporcionalmente."
+    )
+    matriz_padrao = pd.DataFrame(
+        matriz_alocacao_padrao(destino) * 100.0,
+        index=ITENS_COMPARTILHADOS + ITENS_PRODUTO,
+        columns=PRODUTOS,
+    )
+    matriz_editada = st.data_editor(matriz_padrao, key="mp_alocacao")
+
+    alocacao = matriz_editada.to_numpy(dtype=float)
+    soma_linhas = alocacao.sum(axis=1, keepdims=True)
+    # Células apagadas no editor viram NaN e passariam pelas comparações
+    if not np.isfinite(alocacao).all() or (alocacao < 0).any() or (soma_linhas <= 0).any():
+        st.error(
+            "Cada linha da matriz de alocação precisa ter todas as células preenchidas, "
+            "com valores positivos e soma maior que zero."
+        )
+        st.session_state["custos_produtos"] = None
+        return
+    alocacao = alocacao / soma_linhas
+
+    # Um único produtor: uma linha nas matrizes
+    custos_itens = np.array([custos_compartilhados + custos_processamento])
+    custo_produtos, volume_produtos, cvu_produtos = custear_multiproduto(
+        custos_itens,
+        alocacao,
+        np.array([area_ha * produtividade_kg_ha]),
+        np.array([perda_campo_percent / 100.0]),
+        destino,
+        perdas_processo,
+    )
+
+    st.markdown("### Resultados do custeio multiproduto")
+    st.dataframe(pd.DataFrame({
+        "Custo variável alocado (R$)": custo_produtos[0],
+        "Produção final vendável (kg)": volume_produtos[0],
+        "Custo variável unitário (R$/kg)": cvu_produtos[0],
+    }, index=PRODUTOS))
+
+    custos_produtos = {}
+    for j, produto in enumerate(PRODUTOS):
+        if volume_produtos[0, j] > 0 and area_ha > 0:
+            custos_produtos[produto] = {
+                "custo_variavel_unitario": float(cvu_produtos[0, j]),
+                "producao_final_kg": float(volume_produtos[0, j]),
+                "produtividade_kg_ha": float(volume_produtos[0, j] / area_ha),
+                # Área desta aba: com ela, área × produtividade = produção vendável
+                "area_ha": float(area_ha),
+            }
+    st.session_state["custos_produtos"] = custos_produtos
+
+    if custos_produtos:
+        st.caption(
+            "Esses valores ficam disponíveis nas abas de **Simulação Monte Carlo** e **Precificação**: "
+            "basta escolher o produto no campo \"Produto considerado\"."
+        )
+    else:
+        st.error("Nenhum produto ficou com produção vendável. Ajuste os dados de produção e perdas.")
+
+    with st.expander("Vários produtores de uma vez (arquivo CSV)", expanded=False):
+        st.write(
+            "Envie um arquivo CSV com uma linha por produtor e as colunas: "
+            f"`{'`, `'.join(COLUNAS_CSV_PRODUCAO + COLUNAS_CSV_ITENS)}`. "
+            "Os custos são totais em R$. O destino da raiz, as perdas de processamento e a matriz "
+            "de alocação usados são os desta aba."
+        )
+        arquivo = st.file_uploader("Arquivo CSV dos produtores", type="csv", key="mp_csv")
+        if arquivo is not None:
+            try:
+                produtores = pd.read_csv(arquivo)
+            except (pd.errors.EmptyDataError, pd.errors.ParserError, UnicodeDecodeError):
+                st.error("Não foi possível ler o arquivo. Confira se é um CSV com cabeçalho e ao menos uma linha.")
+                return
+            faltando = [c for c in COLUNAS_CSV_PRODUCAO + COLUNAS_CSV_ITENS if c not in produtores.columns]
+            if faltando:
+                st.error(f"Colunas que faltam no arquivo: {', '.join(faltando)}.")
+                return
+
+            colunas_numericas = COLUNAS_CSV_PRODUCAO[1:] + COLUNAS_CSV_ITENS
+            valores = produtores[colunas_numericas].apply(pd.to_numeric, errors="coerce")
+            invalidos = valores.isna().to_numpy()
+            if invalidos.any():
+                st.error(
+                    "Valores vazios ou não numéricos no arquivo: "
+                    f"{'; '.join(linhas_com_problema(invalidos, colunas_numericas))}."
+                )
+                return
+
+            # Mesmos limites dos campos da aba: nada negativo e perda até 100%
+            fora_da_faixa = (valores < 0).to_numpy()
+            fora_da_faixa[:, colunas_numericas.index("perda_campo_percent")] |= (
+                valores["perda_campo_percent"].to_numpy() > 100
+            )
+            if fora_da_faixa.any():
+                st.error(
+                    "Valores fora da faixa permitida (custos, área e produtividade não podem ser negativos; "
+                    "a perda deve ficar entre 0 e 100%): "
+                    f"{'; '.join(linhas_com_problema(fora_da_faixa, colunas_numericas))}."
+                )
+                return
+
+            _, volumes, cvus = custear_multiproduto(
+                valores[COLUNAS_CSV_ITENS].to_numpy(dtype=float),
+                alocacao,
+                (valores["area_ha"] * valores["produtividade_kg_ha"]).to_numpy(dtype=float),
+                valores["perda_campo_percent"].to_numpy(dtype=float) / 100.0,
+                destino,
+                perdas_processo,
+            )
+
+            resultado = pd.concat([
+                pd.DataFrame(volumes, columns=[f"Produção vendável {p} (kg)" for p in PRODUTOS]),
+                pd.DataFrame(cvus, columns=[f"Custo variável {p} (R$/kg)" for p in PRODUTOS]),
+            ], axis=1)
+            resultado.index = produtores["produtor"]
+            st.dataframe(resultado)
+            st.download_button(
+                "Baixar resultados (CSV)",
+                resultado.to_csv().encode("utf-8"),
+                file_name="custeio_multiproduto.csv",
+                mime="text/csv",
+            )
+
+
+# ---------------------------------------------------------
+# Página 5 – Ponto de equilíbrio
+# ---------------------------------------------------------
+def figura_mapa(x, y, z, titulo, rotulo_x, rotulo_y, rotulo_cor, contornos=()):
+    """
+    Mapa de calor de `z` (linhas = y, colunas = x) com linhas de contorno
+    opcionais, dadas como (nível, cor, legenda).
+    """
+    fig = Figure()
+    ax = fig.subplots()
+    imagem = ax.imshow(
+        z,
+        origin="lower",
+        aspect="auto",
+        extent=(x[0], x[-1], y[0], y[-1]),
+    )
+    fig.colorbar(imagem, ax=ax, label=rotulo_cor)
+
+    finitos = z[np.isfinite(z)]
+    com_legenda = False
+    for nivel, cor, legenda in contornos:
+        if finitos.size and finitos.min() < nivel < finitos.max():
+            ax.contour(x, y, z, levels=[nivel], colors=cor)
+            ax.plot([], [], color=cor, label=legenda)
+            com_legenda = True
+    if com_legenda:
+        ax.legend(loc="upper left", fontsize="small")
+
+    ax.set_title(titulo)
+    ax.set_xlabel(rotulo_x)
+    ax.set_ylabel(rotulo_y)
+    return fig
+
+
+def pagina_ponto_equilibrio():
+    st.header("5. Ponto de equilíbrio e margem-alvo")
+
+    with st.expander("O que esta aba faz? (clique para ver)", expanded=True):
+        st.write(
+            "Em vez de testar valores um a um, aqui o sistema calcula **de uma vez** o resultado para "
+            "muitas combinações de:\n"
+            "- preço × produtividade;\n"
+            "- preço × custo variável por kg.\n\n"
+            "Para cada combinação ele mostra a **margem de contribuição**, o **volume de equilíbrio** "
+            "(quantos kg é preciso vender para pagar os custos fixos) e a **chance de prejuízo**, "
+            "considerando que preço, produtividade e custo podem variar. No final, sugere um "
+            "**preço mínimo** para levar à aba de Precificação."
+        )
+
+    area_ha = st.session_state["area_ha"] or 1.0
+    cvu_base = st.session_state["custo_variavel_unitario"] or 1.50
+    if st.session_state["producao_final_kg"] and st.session_state["area_ha"]:
+        prod_base = st.session_state["producao_final_kg"] / st.session_state["area_ha"]
+    else:
+        prod_base = 15200.0
+    produto = escolher_produto("produto_equilibrio")
+    if produto is not None:
+        dados_produto = st.session_state["custos_produtos"][produto]
+        area_ha = dados_produto["area_ha"]
+        prod_base = dados_produto["produtividade_kg_ha"]
+        cvu_base = dados_produto["custo_variavel_unitario"]
+
+    st.subheader("Situação de referência")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        area_ha = st.number_input(
+            "Área considerada (ha)",
+            min_value=0.0,
+            step=0.1,
+            value=float(area_ha),
+            key="pe_area_ha",
+        )
+    with col2:
+        prod_base = st.number_input(
+            "Produtividade vendável esperada (kg/ha)",
+            min_value=0.0,
+            step=100.0,
+            value=float(prod_base),
+            key="pe_prod_base",
+            help="Kg prontos para venda por hectare, já descontadas as perdas."
+        )
+    with col3:
+        cvu_base = st.number_input(
+            "Custo variável unitário esperado (R$/kg)",
+            min_value=0.0,
+            step=0.05,
+            value=float(cvu_base),
+            key="pe_cvu_base",
+        )
+
+    col4, col5, col6 = st.columns(3)
+    with col4:
+        custos_fixos = st.number_input(
+            "Custos fixos a cobrir (R$)",
+            min_value=0.0,
+            step=100.0,
+            value=1000.0,
+            key="pe_custos_fixos",
+        )
+    with col5:
+        lucro_desejado = st.number_input(
+            "Lucro desejado (R$)",
+            min_value=0.0,
+            step=100.0,
+            value=0.0,
+            key="pe_lucro",
+            help="Usado para desenhar a linha de margem-alvo nos gráficos."
+        )
+    with col6:
+        taxa_percent = st.number_input(
+            "Impostos + despesas variáveis (% do preço)",
+            min_value=0.0,
+            max_value=99.0,
+            step=0.5,
+            value=0.0,
+            key="pe_taxa",
+        )
+
+    st.subheader("Faixas analisadas")
+    col_g1, col_g2, col_g3 = st.columns(3)
+    with col_g1:
+        preco_min = st.number_input("Preço mínimo (R$/kg)", min_value=0.0, step=0.10,
+                                    value=float(cvu_base * 0.5), key="pe_preco_min")
+        preco_max = st.number_input("Preço máximo (R$/kg)", min_value=0.0, step=0.10,
+                                    value=float(cvu_base * 3.0), key="pe_preco_max")
+    with col_g2:
+        prod_min = st.number_input("Produtividade mínima (kg/ha)", min_value=1.0, step=100.0,
+                                   value=float(max(prod_base * 0.5, 1.0)), key="pe_prod_min")
+        prod_max = st.number_input("Produtividade máxima (kg/ha)", min_value=1.0, step=100.0,
+                                   value=float(max(prod_base * 1.5, 2.0)), key="pe_prod_max")
+    with col_g3:
+        cvu_min = st.number_input("Custo variável mínimo (R$/kg)", min_value=0.0, step=0.05,
+                                  value=float(cvu_base * 0.5), key="pe_cvu_min")
+        cvu_max = st.number_input("Custo variável máximo (R$/kg)", min_value=0.0, step=0.05,
+                                  value=float(cvu_base * 1.5), key="pe_cvu_max")
+
+    n_pontos = st.slider(
+        "Pontos em cada eixo da grade",
+        min_value=50,
+        max_value=500,
+        value=200,
+        step=50,
+        help="Com 500, cada gráfico tem 250 mil combinações."
+    )
+
+    st.subheader("Incerteza considerada na chance de prejuízo")
+    st.caption(
+        "Os mesmos cenários sorteados são usados em todos os pontos da grade. Eles só são sorteados "
+        "de novo quando você muda os valores abaixo."
+    )
+    col_v1, col_v2, col_v3, col_v4 = st.columns(4)
+    with col_v1:
+        var_preco = st.number_input("Variação do preço (± %)", min_value=0.0, max_value=90.0,
+                                    step=1.0, value=20.0, key="pe_var_preco")
+    with col_v2:
+        var_prod = st.number_input("Variação da produtividade (± %)", min_value=0.0, max_value=90.0,
+                                   step=1.0, value=25.0, key="pe_var_prod")
+    with col_v3:
+        var_cvu = st.number_input("Variação do custo variável (± %)", min_value=0.0, max_value=90.0,
+                                  step=1.0, value=20.0, key="pe_var_cvu")
+    with col_v4:
+        n_cenarios = st.selectbox("Número de cenários", [500, 1000, 2000, 5000], index=2,
+                                  key="pe_n_cenarios")
+
+    tolerancia = st.slider(
+        "Chance de prejuízo aceitável (%)",
+        min_value=1,
+        max_value=50,
+        value=10,
+        help="Usada para sugerir o preço mínimo e para a linha de risco nos gráficos."
+    )
+
+    if area_ha <= 0 or prod_base <= 0:
+        st.error("Informe área e produtividade vendável maiores que zero.")
+        return
+    if not (preco_min < preco_max and prod_min < prod_max and cvu_min < cvu_max):
+        st.error("Em cada faixa, o valor mínimo deve ser menor que o máximo.")
+        return
+
+    t = taxa_percent / 100.0
+    producao_base = area_ha * prod_base
+    precos = np.linspace(preco_min, preco_max, n_pontos)
+    prods = np.linspace(prod_min, prod_max, n_pontos)
+    cvus = np.linspace(cvu_min, cvu_max, n_pontos)
+    cenarios = gerar_cenarios_equilibrio(n_cenarios, var_preco / 100.0, var_prod / 100.0, var_cvu / 100.0)
+
+    # Preço de referência para a aba de Precificação
+    preco_equilibrio = (cvu_base + custos_fixos / producao_base) / (1 - t)
+    preco_meta = (cvu_base + (custos_fixos + lucro_desejado) / producao_base) / (1 - t)
+    limiares_base = precos_equilibrio_cenarios(cenarios, producao_base, cvu_base, custos_fixos, t)[0]
+    preco_risco = float(np.quantile(limiares_base, 1 - tolerancia / 100.0))
+
+    st.markdown("### Preços de referência")
+    col_r1, col_r2, col_r3 = st.columns(3)
+    with col_r1:
+        st.metric("Preço de equilíbrio (R$/kg)", f"{preco_equilibrio:,.4f}")
+    with col_r2:
+        st.metric("Preço para o lucro desejado (R$/kg)", f"{preco_meta:,.4f}")
+    with col_r3:
+        st.metric(f"Preço mínimo com até {tolerancia}% de chance de prejuízo (R$/kg)", f"{preco_risco:,.4f}")
+    st.caption(
+        "O preço mínimo com risco controlado foi guardado e aparece na aba de **Precificação com markup** "
+        "para comparar com o preço sugerido."
+    )
+    # As premissas vão junto para a Precificação só comparar cenários iguais
+    st.session_state["preco_minimo_risco"] = {
+        "preco": preco_risco,
+        "tolerancia": float(tolerancia),
+        "produto": produto,
+        "custos_fixos": custos_fixos,
+        "taxa_percent": taxa_percent,
+        "cvu": cvu_base,
+        "producao_kg": producao_base,
+    }
+
+    contornos_margem = [(custos_fixos, "white", "Equilíbrio (lucro zero)")]
+    if lucro_desejado > 0:
+        contornos_margem.append((custos_fixos + lucro_desejado, "red", "Lucro desejado"))
+    contornos_risco = [(tolerancia, "white", f"{tolerancia}% de chance de prejuízo")]
+
+    aba_prod, aba_cvu = st.tabs(["Preço × produtividade", "Preço × custo variável"])
+
+    with aba_prod:
+        # Linhas: produtividade; colunas: preço
+        mcu = precos * (1 - t) - cvu_base
+        producao = area_ha * prods
+        margem = np.outer(producao, mcu)
+        volume_eq = np.divide(custos_fixos, mcu, out=np.full_like(mcu, np.nan), where=mcu > 0)
+        # O volume de equilíbrio só depende do preço; o que varia na grade é a
+        # folga da produção de cada linha sobre ele
+        folga = producao[:, np.newaxis] - volume_eq[np.newaxis, :]
+        prob = 100 * prob_prejuizo_grade(
+            precos,
+            precos_equilibrio_cenarios(cenarios, producao, cvu_base, custos_fixos, t),
+        )
+
+        col_a1, col_a2, col_a3 = st.columns(3)
+        with col_a1:
+            st.pyplot(figura_mapa(
+                precos, prods, margem, "Margem de contribuição total",
+                "Preço (R$/kg)", "Produtividade (kg/ha)", "R$", contornos_margem,
+            ))
+        with col_a2:
+            st.pyplot(figura_mapa(
+                precos, prods, folga, "Produção acima do volume de equilíbrio",
+                "Preço (R$/kg)", "Produtividade (kg/ha)", "kg",
+                [(0.0, "white", "Produção = volume de equilíbrio")],
+            ))
+        with col_a3:
+            st.pyplot(figura_mapa(
+                precos, prods, prob, "Chance de prejuízo",
+                "Preço (R$/kg)", "Produtividade (kg/ha)", "%", contornos_risco,
+            ))
+        st.caption(
+            f"Custo variável fixado em R$ {cvu_base:,.4f}/kg. O gráfico do meio mostra quantos kg a produção "
+            "(área × produtividade) passa do volume de equilíbrio; valores negativos indicam prejuízo."
+        )
+
+    with aba_cvu:
+        # Linhas: custo variável; colunas: preço
+        mcu = precos[np.newaxis, :] * (1 - t) - cvus[:, np.newaxis]
+        margem = mcu * producao_base
+        volume_eq = np.divide(custos_fixos, mcu, out=np.full_like(mcu, np.nan), where=mcu > 0)
+        prob = 100 * prob_prejuizo_grade(
+            precos,
+            precos_equilibrio_cenarios(cenarios, producao_base, cvus, custos_fixos, t),
+        )
+
+        col_b1, col_b2, col_b3 = st.columns(3)
+        with col_b1:
+            st.pyplot(figura_mapa(
+                precos, cvus, margem, "Margem de contribuição total",
+                "Preço (R$/kg)", "Custo variável (R$/kg)", "R$", contornos_margem,
+            ))
+        with col_b2:
+            st.pyplot(figura_mapa(
+                precos, cvus, volume_eq, "Volume de equilíbrio",
+                "Preço (R$/kg)", "Custo variável (R$/kg)", "kg",
+                [(producao_base, "white", "Produção prevista")],
+            ))
+        with col_b3:
+            st.pyplot(figura_mapa(
+                precos, cvus, prob, "Chance de prejuízo",
+                "Preço (R$/kg)", "Custo variável (R$/kg)", "%", contornos_risco,
+            ))
+        st.caption(f"Produção fixada em {producao_base:,.2f} kg (área × produtividade vendável).")
+
+    st.caption(
+        "Áreas em branco nos gráficos de volume: o preço, já descontados impostos e despesas, não cobre "
+        "o custo variável, então não existe volume que pague os custos fixos."
+    )
+
 
 # ---------------------------------------------------------
 # Função principal
@@ -725,7 +1779,9 @@ def main():
         "Use o menu abaixo para navegar\n\n"
         "1. **Custeio variável:** calcula o custo variável por kg.\n"
         "2. **Simulação Monte Carlo:** vê o risco e a variação do resultado.\n"
-        "3. **Precificação com markup:** sugere um preço de venda por kg."
+        "3. **Precificação com markup:** sugere um preço de venda por kg.\n"
+        "4. **Custeio multiproduto:** custo variável por kg de cada produto.\n"
+        "5. **Ponto de equilíbrio:** margem, volume de equilíbrio e risco para muitos preços."
     )
     opcao = st.sidebar.radio(
         "Escolha a funcionalidade:",
@@ -733,6 +1789,8 @@ def main():
             "1. Custeio variável",
             "2. Simulação Monte Carlo",
             "3. Precificação com markup",
+            "4. Custeio multiproduto",
+            "5. Ponto de equilíbrio",
         )
     )
 
@@ -742,6 +1800,10 @@ def main():
         pagina_monte_carlo()
     elif opcao.startswith("3"):
         pagina_precificacao()
+    elif opcao.startswith("4"):
+        pagina_custeio_multiproduto()
+    elif opcao.startswith("5"):
+        pagina_ponto_equilibrio()
 
 
 if __name__ == "__main__":